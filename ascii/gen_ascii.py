@@ -1,84 +1,14 @@
 #!/usr/bin/env python3
 
 import argparse
-from PIL import Image, ImageDraw, ImageFont, ImageOps # Removed ImageFilter as outlines are not in this version
-
-# --- Helper Functions ---
-def hex_to_rgb(hex_color):
-    hex_color = hex_color.lstrip('#')
-    if len(hex_color) != 6:
-        raise ValueError("Invalid hex color format. Use #RRGGBB.")
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-
-def generate_shades(base_rgb, num_total_shades, bg_brightness_factor=0.1):
-    """
-    Generates num_total_shades (including background).
-    Shades[0] is background.
-    base_rgb aims to be a mid-level foreground shade.
-    """
-    if num_total_shades < 2:
-        raise ValueError("Total number of shades must be at least 2 (background + one foreground).")
-
-    shades = []
-    base_r, base_g, base_b = base_rgb
-
-    # 1. Background shade
-    bg_r = int(base_r * bg_brightness_factor)
-    bg_g = int(base_g * bg_brightness_factor)
-    bg_b = int(base_b * bg_brightness_factor)
-    shades.append((bg_r, bg_g, bg_b))
-
-    num_foreground_shades = num_total_shades - 1
-    if num_foreground_shades == 0:
-        return shades # Only background shade
-
-    if num_foreground_shades == 1:
-        shades.append(base_rgb)
-    else:
-        # Aim for base_rgb to be one of the foreground shades, around the middle.
-        # fg_shades_indices: 0 to num_foreground_shades - 1
-        base_target_fg_idx = (num_foreground_shades - 1) // 2 # Index for base_rgb within fg shades
-
-        for i in range(num_foreground_shades):
-            r, g, b = 0, 0, 0
-            # Interpolate from a dark variant of base, through base, to a light variant of base
-            dark_fg_start_r = int(bg_r + (base_r - bg_r) * 0.3) # Start a bit above pure background
-            dark_fg_start_g = int(bg_g + (base_g - bg_g) * 0.3)
-            dark_fg_start_b = int(bg_b + (base_b - bg_b) * 0.3)
-
-            light_fg_end_r = int(base_r + (255 - base_r) * 0.85) # End a bit below pure white
-            light_fg_end_g = int(base_g + (255 - base_g) * 0.85)
-            light_fg_end_b = int(base_b + (255 - base_b) * 0.85)
-
-            if i < base_target_fg_idx:
-                # Interpolate from dark_fg_start to base_rgb
-                # t goes from 0 to nearly 1 for this segment
-                t = i / base_target_fg_idx if base_target_fg_idx > 0 else 0 # Avoid div by zero if base_target_fg_idx is 0
-                r = int(dark_fg_start_r + (base_r - dark_fg_start_r) * t)
-                g = int(dark_fg_start_g + (base_g - dark_fg_start_g) * t)
-                b = int(dark_fg_start_b + (base_b - dark_fg_start_b) * t)
-            elif i == base_target_fg_idx:
-                r, g, b = base_r, base_g, base_b
-            else: # i > base_target_fg_idx
-                # Interpolate from base_rgb to light_fg_end
-                # t goes from just above 0 to 1 for this segment
-                # Number of steps in this segment: (num_foreground_shades - 1) - base_target_fg_idx
-                steps_in_segment = (num_foreground_shades - 1) - base_target_fg_idx
-                current_step_in_segment = i - base_target_fg_idx
-                t = current_step_in_segment / steps_in_segment if steps_in_segment > 0 else 0
-                r = int(base_r + (light_fg_end_r - base_r) * t)
-                g = int(base_g + (light_fg_end_g - base_g) * t)
-                b = int(base_b + (light_fg_end_b - base_b) * t)
-            
-            shades.append((
-                min(max(0, r), 255),
-                min(max(0, g), 255),
-                min(max(0, b), 255)
-            ))
-    
-    # print(f"Generated {len(shades)} shades: {shades}") # Keep for debugging if needed
-    return shades
+import os
+import sys
+import numpy as np
+from PIL import Image, ImageFont, ImageOps # Removed ImageFilter as outlines are not in this version
 
+# imagebits_common.py lives at the repository root, shared with shader/gen_shader.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from imagebits_common import hex_to_rgb, generate_char_shades, load_font, font_metrics, render_glyph_mask, resize_to_grid, render_tiles
 
 # --- Main Function ---
 def image_to_ascii_art(
@@ -109,28 +39,13 @@ def image_to_ascii_art(
     num_total_shades = num_foreground_levels + 1
 
     try:
-        shades = generate_shades(base_rgb, num_total_shades)
+        shades = generate_char_shades(base_rgb, num_total_shades)
     except ValueError as e:
         print(f"Error generating shades: {e}")
         return
 
     try:
-        if font_path:
-            font = ImageFont.truetype(font_path, font_size)
-        else:
-            common_fonts = ["DejaVuSansMono.ttf", "Consolas", "Courier New", "Menlo", "LiberationMono-Regular.ttf"]
-            loaded = False
-            for fname in common_fonts:
-                try:
-                    font = ImageFont.truetype(fname, font_size)
-                    # print(f"Using font: {fname}") # Less verbose
-                    loaded = True
-                    break
-                except IOError:
-                    continue
-            if not loaded:
-                print("Warning: Could not load a default monospaced font. Trying PIL's default bitmap font (may look suboptimal).")
-                font = ImageFont.load_default()
+        font = load_font(font_path, font_size)
     except IOError:
         print(f"Error: Could not load font from '{font_path}'. Ensure the .ttf file exists or is in system paths. Trying PIL's default.")
         font = ImageFont.load_default()
@@ -138,17 +53,7 @@ def image_to_ascii_art(
         print(f"An unexpected error occurred while loading the font: {e}")
         return
 
-    try:
-        bbox = font.getbbox("M") # (left, top, right, bottom) for Pillow >= 9.1.0
-        char_w_est = bbox[2] - bbox[0]
-        ascent, descent = font.getmetrics() if hasattr(font, 'getmetrics') else (bbox[3] - bbox[1] - font.getbbox("g")[1] + bbox[1], font.getbbox("g")[1] - bbox[1]) # Crude fallback for getmetrics
-        char_h_est = ascent + descent
-    except AttributeError: # Fallback for older Pillow or basic font
-        try:
-            char_w_est, char_h_est = font.getsize("M") if hasattr(font, 'getsize') else (font_size // 2, font_size)
-        except AttributeError: # Ultimate fallback for PIL default font
-             char_w_est, char_h_est = font_size // 2, font_size
-
+    char_w_est, char_h_est = font_metrics(font, font_size)
 
     actual_cell_width_px = cell_width_px if cell_width_px is not None else int(char_w_est * 1.0)
     actual_cell_height_px = cell_height_px if cell_height_px is not None else int(char_h_est * 1.0)
@@ -165,11 +70,7 @@ def image_to_ascii_art(
         print(f"Error opening image: {e}")
         return
 
-    if posterize_bits > 0 and posterize_bits <= 8:
-        img = ImageOps.posterize(img.convert("RGB"), posterize_bits)
-
-    img_gray = img.convert("L")
-    original_width_px, original_height_px = img_gray.size
+    original_width_px, original_height_px = img.size
 
     # Corrected aspect ratio calculation:
     # aspect_ratio_correction is cell_width / cell_height
@@ -182,66 +83,36 @@ def image_to_ascii_art(
     output_grid_height_chars = int(output_width_chars * image_vertical_aspect / aspect_ratio_correction)
     if output_grid_height_chars < 1: output_grid_height_chars = 1
 
-    img_resized_gray = img_gray.resize((output_width_chars, output_grid_height_chars), Image.Resampling.LANCZOS)
+    # Posterization only touches the resized character grid
+    img_resized_gray = resize_to_grid(img, (output_width_chars, output_grid_height_chars))
+    if posterize_bits > 0 and posterize_bits <= 8:
+        img_resized_gray = ImageOps.posterize(img_resized_gray, posterize_bits)
     # print(f"Resized image to character grid: {output_width_chars}x{output_grid_height_chars}")
 
-    final_img_width_px = output_width_chars * actual_cell_width_px
-    final_img_height_px = output_grid_height_chars * actual_cell_height_px
-    
-    output_img = Image.new("RGB", (final_img_width_px, final_img_height_px), color=shades[0]) # Background
-    draw = ImageDraw.Draw(output_img)
+    # --- Pre-render one tile per character (glyph atlas) ---
+    # Each glyph is rasterized once in its shade instead of once per cell.
+    glyphs = np.empty((num_foreground_levels, actual_cell_height_px, actual_cell_width_px, 3), dtype=np.uint8)
+    glyphs[:] = shades[0] # Background
+    cell_size = (actual_cell_width_px, actual_cell_height_px)
+    background_tile = Image.new("RGB", cell_size, color=shades[0])
+    fg_shades = shades[1:]
+    for element_idx, (char_to_draw, color_for_char) in enumerate(zip(charset, fg_shades)):
+        if skip_lightest_char_if_space and element_idx == 0 and char_to_draw == ' ':
+            continue
 
-    grayscale_step = 256.0 / num_foreground_levels if num_foreground_levels > 0 else 256.0
-
-    for y_char_idx in range(output_grid_height_chars):
-        for x_char_idx in range(output_width_chars):
-            brightness = img_resized_gray.getpixel((x_char_idx, y_char_idx))
-            
-            element_idx = 0
-            if num_foreground_levels > 0:
-                 element_idx = min(int(brightness / grayscale_step), num_foreground_levels - 1)
-            
-            char_to_draw = charset[element_idx] if num_foreground_levels > 0 else ' '
-            color_for_char = shades[element_idx + 1] if num_foreground_levels > 0 else shades[0]
-
-            if skip_lightest_char_if_space and element_idx == 0 and char_to_draw == ' ' and num_foreground_levels > 0:
-                continue
-
-            cell_center_x = (x_char_idx * actual_cell_width_px) + (actual_cell_width_px / 2)
-            cell_center_y = (y_char_idx * actual_cell_height_px) + (actual_cell_height_px / 2)
-            
-            try:
-                draw.text(
-                    (cell_center_x, cell_center_y),
-                    char_to_draw,
-                    font=font,
-                    fill=color_for_char,
-                    anchor="mm"
-                )
-            except TypeError as e:
-                if "anchor" in str(e).lower() or "keyword argument" in str(e).lower(): # Broader check for anchor issue
-                    char_bbox = font.getbbox(char_to_draw) if hasattr(font, 'getbbox') else (0,0,0,0)
-                    char_w = char_bbox[2] - char_bbox[0] if hasattr(font, 'getbbox') else font.getsize(char_to_draw)[0] if hasattr(font, 'getsize') else actual_cell_width_px / 2
-                    char_h = char_bbox[3] - char_bbox[1] if hasattr(font, 'getbbox') else font.getsize(char_to_draw)[1] if hasattr(font, 'getsize') else actual_cell_height_px / 2
-                    
-                    # For y-centering with baseline, using ascent and descent is better.
-                    ascent, descent = font.getmetrics() if hasattr(font, 'getmetrics') else (char_h * 0.75, char_h * 0.25) # Approx
-                    text_x = cell_center_x - char_w / 2
-                    # text_y calculation to align baseline to middle of cell is tricky without anchor='mm'
-                    # A common approach is to position based on ascent for top-left.
-                    # For centering, this is roughly:
-                    text_y = cell_center_y - (ascent - descent) / 2 - descent # This is often closer for middle align
-                    # A simpler one if the above is off: cell_center_y - char_h / 2
-                    
-                    # Simplified y for older Pillow:
-                    text_y = cell_center_y - char_h / 2 + (char_bbox[1] if char_bbox else 0) # char_bbox[1] is often negative top bearing
-
-                    draw.text((text_x, text_y), char_to_draw, font=font, fill=color_for_char)
-                else:
-                    raise e
-            except Exception as e_draw: # Catch other potential drawing errors
-                print(f"Warning: Error drawing character '{char_to_draw}' at ({x_char_idx},{y_char_idx}): {e_draw}")
-                continue
+        try:
+            mask = render_glyph_mask(font, char_to_draw, *cell_size)
+        except Exception as e_draw: # Catch other potential drawing errors
+            print(f"Warning: Error drawing character '{char_to_draw}': {e_draw}")
+            continue
+
+        # Color the glyph by compositing its shade over the background through the coverage mask
+        glyph_img = Image.composite(Image.new("RGB", cell_size, color=color_for_char), background_tile, mask)
+        glyphs[element_idx] = np.asarray(glyph_img)
+
+    # --- Map brightness to characters and blit the glyph tiles ---
+    brightness = np.asarray(img_resized_gray, dtype=np.uint8)
+    output_img = Image.fromarray(render_tiles(brightness, glyphs), "RGB")
 
 
     try:
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+# Shared helpers for ascii/gen_ascii.py and shader/gen_shader.py: color parsing, shade ramps,
+# font/glyph rendering, image preparation and the tile renderer both scripts draw with.
+
+from functools import lru_cache
+import re
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+COMMON_FONTS = ["DejaVuSansMono.ttf", "Consolas", "Courier New", "Menlo", "LiberationMono-Regular.ttf"]
+
+# --- Colors ---
+def hex_to_rgb(hex_color):
+    """Converts a hex color string (e.g., '#RRGGBB') to an RGB tuple."""
+    hex_color = hex_color.lstrip('#')
+    if not re.fullmatch(r"[0-9a-fA-F]{6}", hex_color):
+        raise ValueError("Invalid hex color format. Use #RRGGBB.")
+    value = int(hex_color, 16)
+    return ((value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff)
+
+def generate_shades(base_rgb, num_shades=5, bg_brightness_factor=0.1):
+    """
+    Generates a list of RGB color shades based on the base color.
+    Includes a dark background shade and progressively lighter shades up to white.
+    """
+    if num_shades < 2:
+        raise ValueError("Number of shades must be at least 2.")
+    if num_shades > 256:
+        raise ValueError("Number of shades must be at most 256 (one palette entry per shade).")
+
+    # Interpolate linearly between three anchors: Dark -> Base -> Light
+    # Shade 0: Darkest (background, a very dark version of base color)
+    # Shade mid: Base
+    # Shade N-1: Lightest (white)
+    anchors = np.array([
+        [int(c * bg_brightness_factor) for c in base_rgb],
+        base_rgb,
+        (255, 255, 255),
+    ], dtype=np.float64)
+    mid_point_index = (num_shades - 1) / 2.0
+    positions = [0, mid_point_index, num_shades - 1]
+
+    steps = np.arange(num_shades)
+    ramp = np.stack([np.interp(steps, positions, anchors[:, c]) for c in range(3)], axis=1)
+    return [tuple(s) for s in np.clip(ramp, 0, 255).astype(np.uint8).tolist()]
+
+def generate_char_shades(base_rgb, num_total_shades, bg_brightness_factor=0.1):
+    """
+    Generates num_total_shades (including background).
+    Shades[0] is background.
+    base_rgb aims to be a mid-level foreground shade.
+    """
+    if num_total_shades < 2:
+        raise ValueError("Total number of shades must be at least 2 (background + one foreground).")
+
+    shades = []
+    base_r, base_g, base_b = base_rgb
+
+    # 1. Background shade
+    bg_r = int(base_r * bg_brightness_factor)
+    bg_g = int(base_g * bg_brightness_factor)
+    bg_b = int(base_b * bg_brightness_factor)
+    shades.append((bg_r, bg_g, bg_b))
+
+    num_foreground_shades = num_total_shades - 1
+    if num_foreground_shades == 1:
+        shades.append(base_rgb)
+    else:
+        # Aim for base_rgb to be one of the foreground shades, around the middle.
+        # fg_shades_indices: 0 to num_foreground_shades - 1
+        base_target_fg_idx = (num_foreground_shades - 1) // 2 # Index for base_rgb within fg shades
+
+        # Interpolate from a dark variant of base, through base, to a light variant of base
+        dark_fg_start = [int(bg + (base - bg) * 0.3) for bg, base in zip(shades[0], base_rgb)] # Start a bit above pure background
+        light_fg_end = [int(base + (255 - base) * 0.85) for base in base_rgb] # End a bit below pure white
+        anchors = np.array([dark_fg_start, base_rgb, light_fg_end], dtype=np.float64)
+
+        # dark_fg_start -> base_rgb (base excluded), then base_rgb -> light_fg_end (both included)
+        lower = np.linspace(anchors[0], anchors[1], base_target_fg_idx, endpoint=False)
+        upper = np.linspace(anchors[1], anchors[2], num_foreground_shades - base_target_fg_idx)
+        fg_shades = np.clip(np.concatenate([lower, upper]), 0, 255).astype(np.uint8)
+        shades.extend(tuple(s) for s in fg_shades.tolist())
+
+    return shades
+
+# --- Fonts and Glyphs ---
+@lru_cache(maxsize=32)
+def load_font(font_path, font_size):
+    """
+    Loads font_path, or the first available common monospaced font if font_path is None.
+    Cached so repeated runs don't re-open and re-parse the same .ttf file.
+    Raises IOError if an explicit font_path can't be loaded.
+    """
+    if font_path:
+        return ImageFont.truetype(font_path, font_size)
+
+    for fname in COMMON_FONTS:
+        try:
+            # print(f"Using font: {fname}") # Less verbose
+            return ImageFont.truetype(fname, font_size)
+        except IOError:
+            continue
+    print("Warning: Could not load a default monospaced font. Trying PIL's default bitmap font (may look suboptimal).")
+    return ImageFont.load_default()
+
+@lru_cache(maxsize=32)
+def font_metrics(font, font_size):
+    """Returns the estimated (width, height) of a character cell for font."""
+    try:
+        bbox = font.getbbox("M") # (left, top, right, bottom) for Pillow >= 9.1.0
+        char_w_est = bbox[2] - bbox[0]
+        ascent, descent = font.getmetrics() if hasattr(font, 'getmetrics') else (bbox[3] - bbox[1] - font.getbbox("g")[1] + bbox[1], font.getbbox("g")[1] - bbox[1]) # Crude fallback for getmetrics
+        char_h_est = ascent + descent
+    except AttributeError: # Fallback for older Pillow or basic font
+        try:
+            char_w_est, char_h_est = font.getsize("M") if hasattr(font, 'getsize') else (font_size // 2, font_size)
+        except AttributeError: # Ultimate fallback for PIL default font
+             char_w_est, char_h_est = font_size // 2, font_size
+    return char_w_est, char_h_est
+
+@lru_cache(maxsize=32)
+def _supports_anchor(font):
+    """Probes once per font whether ImageDraw.text accepts anchor= (older Pillow doesn't)."""
+    try:
+        ImageDraw.Draw(Image.new("L", (1, 1))).text((0, 0), "M", font=font, fill=0, anchor="mm")
+    except TypeError as e:
+        if "anchor" in str(e).lower() or "keyword argument" in str(e).lower(): # Broader check for anchor issue
+            return False
+        raise
+    return True
+
+def _draw_centered_anchor(draw, font, cell_width_px, cell_height_px, char_to_draw):
+    draw.text((cell_width_px / 2, cell_height_px / 2), char_to_draw, font=font, fill=255, anchor="mm")
+
+def _draw_centered_manual(draw, font, cell_width_px, cell_height_px, char_to_draw):
+    """Centers char_to_draw in the cell without anchor= support (older Pillow)."""
+    cell_center_x = cell_width_px / 2
+    cell_center_y = cell_height_px / 2
+    char_bbox = font.getbbox(char_to_draw) if hasattr(font, 'getbbox') else (0,0,0,0)
+    char_w = char_bbox[2] - char_bbox[0] if hasattr(font, 'getbbox') else font.getsize(char_to_draw)[0] if hasattr(font, 'getsize') else cell_width_px / 2
+    char_h = char_bbox[3] - char_bbox[1] if hasattr(font, 'getbbox') else font.getsize(char_to_draw)[1] if hasattr(font, 'getsize') else cell_height_px / 2
+
+    text_x = cell_center_x - char_w / 2
+    # text_y calculation to align baseline to middle of cell is tricky without anchor='mm'
+    # Simplified y for older Pillow:
+    text_y = cell_center_y - char_h / 2 + (char_bbox[1] if char_bbox else 0) # char_bbox[1] is often negative top bearing
+
+    draw.text((text_x, text_y), char_to_draw, font=font, fill=255)
+
+@lru_cache(maxsize=512)
+def render_glyph_mask(font, char_to_draw, cell_width_px, cell_height_px):
+    """
+    Renders char_to_draw centered in a cell-sized 'L' coverage mask (255 = ink).
+    Masks are color-independent, so they are cached and reused across shades and runs.
+    """
+    mask = Image.new("L", (cell_width_px, cell_height_px), color=0)
+    draw_centered = _draw_centered_anchor if _supports_anchor(font) else _draw_centered_manual
+    draw_centered(ImageDraw.Draw(mask), font, cell_width_px, cell_height_px, char_to_draw)
+    return mask
+
+# --- Image Preparation ---
+def resize_to_grid(img, grid_size):
+    """
+    Converts img to grayscale and resizes it to grid_size (columns, rows). With reducing_gap,
+    Pillow first area-averages whole blocks (Image.reduce) and only resamples the remaining
+    (< 2x) gap, keeping the source extent exact.
+    """
+    return img.convert("L").resize(grid_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+# --- Rendering ---
+def render_tiles(brightness, tiles):
+    """
+    Renders a (rows, cols) uint8 brightness grid with tiles of shape (levels, cell_h, cell_w, channels):
+    brightness is split into len(tiles) equal levels (brighter -> higher index) and each cell
+    is replaced by the tile of its level. Returns a (rows * cell_h, cols * cell_w, channels) array.
+    """
+    num_levels, cell_height, cell_width, channels = tiles.shape
+    height, width = brightness.shape
+
+    # 256-entry lookup table: brightness -> tile index, folded into the tiles themselves
+    # so every cell costs a single gather (brightness -> tile) instead of two
+    brightness_lut = np.minimum((np.arange(256) * num_levels) // 256, num_levels - 1)
+    brightness_tiles = tiles[brightness_lut] # (256, cell_h, cell_w, channels)
+
+    # (rows, cols, cell_h, cell_w, channels) -> (rows * cell_h, cols * cell_w, channels)
+    return brightness_tiles[brightness].transpose(0, 2, 1, 3, 4).reshape(
+        height * cell_height, width * cell_width, channels
+    )